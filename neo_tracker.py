@@ -1,12 +1,15 @@
-import requests
-import json
+import aiohttp
+import asyncio
+from aiolimiter import AsyncLimiter
+import io
+import numpy as np
+import orjson
+import os
 import pandas as pd
 import sqlite3
 import streamlit as st
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import time
-import matplotlib.pyplot as plt
-import seaborn as sns
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
@@ -19,9 +22,48 @@ st.set_page_config(
     layout="wide"
 )
 
+def _connect():
+    """Open a connection to the NEO database with performance pragmas applied.
+
+    journal_mode=WAL is persistent, but synchronous/temp_store/cache_size/
+    mmap_size are per-connection, so every connection goes through here.
+    """
+    conn = sqlite3.connect('nasa_neo_data.db', check_same_thread=False)
+    conn.executescript('''
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+    ''')
+    return conn
+
+@st.cache_resource
+def get_conn():
+    """Process-wide SQLite connection, shared across Streamlit reruns"""
+    return _connect()
+
+# Secondary indexes on close_approach; dropped and rebuilt around bulk
+# ingests so inserts don't pay per-row B-tree maintenance. The unique index
+# on asteroids(neo_reference_id) stays put since INSERT OR IGNORE needs it.
+# idx_ca_cover covers the join + aggregate columns used by the predefined
+# queries, turning them into index-only scans.
+SECONDARY_INDEXES = {
+    "idx_neo_reference_id": "CREATE INDEX IF NOT EXISTS idx_neo_reference_id ON close_approach(neo_reference_id)",
+    "idx_close_approach_date": "CREATE INDEX IF NOT EXISTS idx_close_approach_date ON close_approach(close_approach_date)",
+    "idx_ca_date_epoch": "CREATE INDEX IF NOT EXISTS idx_ca_date_epoch ON close_approach(close_approach_date_epoch)",
+    "idx_ca_epoch_au": "CREATE INDEX IF NOT EXISTS idx_ca_epoch_au ON close_approach(close_approach_date_epoch, astronomical)",
+    "idx_ca_au": "CREATE INDEX IF NOT EXISTS idx_ca_au ON close_approach(astronomical)",
+    "idx_ca_lunar": "CREATE INDEX IF NOT EXISTS idx_ca_lunar ON close_approach(miss_distance_lunar)",
+    "idx_ca_vel": "CREATE INDEX IF NOT EXISTS idx_ca_vel ON close_approach(relative_velocity_kmph)",
+    "idx_ca_cover": "CREATE INDEX IF NOT EXISTS idx_ca_cover ON close_approach("
+                    "neo_reference_id, close_approach_date, miss_distance_km, "
+                    "miss_distance_lunar, relative_velocity_kmph, astronomical)",
+}
+
 def setup_database():
     """Create SQLite database and required tables, or update schema if needed"""
-    conn = sqlite3.connect('nasa_neo_data.db')
+    conn = get_conn()
     cursor = conn.cursor()
     
 
@@ -54,6 +96,7 @@ def setup_database():
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         neo_reference_id INTEGER,
         close_approach_date DATE,
+        close_approach_date_epoch INTEGER,
         relative_velocity_kmph FLOAT,
         astronomical FLOAT,
         miss_distance_km FLOAT,
@@ -63,165 +106,317 @@ def setup_database():
     )
     ''')
 
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_neo_reference_id ON close_approach(neo_reference_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_close_approach_date ON close_approach(close_approach_date)')
-    
+    cursor.execute("PRAGMA table_info(close_approach)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'close_approach_date_epoch' not in columns:
+        logger.debug("Adding close_approach_date_epoch column to close_approach table")
+        cursor.execute('ALTER TABLE close_approach ADD COLUMN close_approach_date_epoch INTEGER')
+
+        cursor.execute("UPDATE close_approach SET close_approach_date_epoch = CAST(strftime('%s', close_approach_date) AS INTEGER) / 86400 WHERE close_approach_date_epoch IS NULL")
+
+    for ddl in SECONDARY_INDEXES.values():
+        cursor.execute(ddl)
+
+    # partial index: the hazardous top-N queries become a backward index
+    # scan with no sort, and non-hazardous rows never enter the B-tree
+    cursor.execute('DROP INDEX IF EXISTS idx_ast_hazard_diam')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_ast_haz_diam ON asteroids(estimated_diameter_max_km DESC) WHERE is_potentially_hazardous_asteroid = 1')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_a_diam ON asteroids(estimated_diameter_max_km)')
+
     conn.commit()
-    conn.close()
 
 
-def fetch_nasa_neo_data(api_key, start_date, days_to_fetch=None, max_records=10000):
+FETCH_CONCURRENCY = 16
+FETCH_MAX_RETRIES = 5
+
+async def _fetch_window(session, semaphore, limiter, api_key, start_str, end_str):
+    """Fetch one 7-day feed window, retrying with backoff when rate limited"""
+    url = f"https://api.nasa.gov/neo/rest/v1/feed?start_date={start_str}&end_date={end_str}&api_key={api_key}"
+    for attempt in range(FETCH_MAX_RETRIES):
+        async with limiter:
+            async with semaphore:
+                async with session.get(url) as response:
+                    if response.status in (429, 503):
+                        retry_after = response.headers.get("Retry-After")
+                        delay = float(retry_after) if retry_after else min(60, 2 ** attempt)
+                        logger.debug(f"Got {response.status} for {start_str}, retrying in {delay:.0f}s")
+                    elif response.status != 200:
+                        text = await response.text()
+                        raise RuntimeError(f"Error fetching data: {response.status} - {text}")
+                    else:
+                        return orjson.loads(await response.read())
+        await asyncio.sleep(delay)
+    raise RuntimeError(f"Error fetching data: still rate limited after {FETCH_MAX_RETRIES} attempts")
+
+async def _gather_windows(api_key, windows):
+    """Fetch a batch of (start_str, end_str) windows concurrently, in order
+
+    Failures come back as exception entries rather than raising, so windows
+    fetched before a failure are never thrown away.
     """
-    Fetch Near-Earth Object data from NASA API
-    
+    connector = aiohttp.TCPConnector(limit_per_host=FETCH_CONCURRENCY, keepalive_timeout=60)
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+    limiter = AsyncLimiter(max_rate=30, time_period=60)
+    async with aiohttp.ClientSession(connector=connector,
+                                     timeout=aiohttp.ClientTimeout(total=30),
+                                     headers={"Accept-Encoding": "gzip"}) as session:
+        tasks = [_fetch_window(session, semaphore, limiter, api_key, start_str, end_str)
+                 for start_str, end_str in windows]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+ASTEROID_COLUMNS = ["id", "neo_reference_id", "name", "absolute_magnitude_h",
+                    "estimated_diameter_min_km", "estimated_diameter_max_km",
+                    "is_potentially_hazardous_asteroid"]
+APPROACH_COLUMNS = ["neo_reference_id", "close_approach_date", "close_approach_date_epoch",
+                    "relative_velocity_kmph", "astronomical", "miss_distance_km",
+                    "miss_distance_lunar", "orbiting_body"]
+
+def _parse_feed_payload(data):
+    """Flatten one feed payload into asteroid and approach DataFrames
+
+    Field extraction and numeric coercion happen column-wise via
+    json_normalize instead of per-row dict walking.
+    """
+    all_neos = [a for day in data["near_earth_objects"].values() for a in day]
+    neos = [a for a in all_neos
+            if a.get("id") and a.get("neo_reference_id") and a.get("name")
+            and a.get("close_approach_data")]
+    if len(neos) < len(all_neos):
+        logger.debug(f"Skipped {len(all_neos) - len(neos)} feed records missing required fields")
+    if not neos:
+        return pd.DataFrame(columns=ASTEROID_COLUMNS), pd.DataFrame(columns=APPROACH_COLUMNS)
+
+    asteroids = pd.json_normalize(neos).rename(columns={
+        "estimated_diameter.kilometers.estimated_diameter_min": "estimated_diameter_min_km",
+        "estimated_diameter.kilometers.estimated_diameter_max": "estimated_diameter_max_km",
+    }).reindex(columns=ASTEROID_COLUMNS)
+    asteroids["id"] = asteroids["id"].astype("int64")
+    asteroids["neo_reference_id"] = asteroids["neo_reference_id"].astype("int64")
+    asteroids["absolute_magnitude_h"] = pd.to_numeric(asteroids["absolute_magnitude_h"], errors="coerce")
+    asteroids["estimated_diameter_min_km"] = pd.to_numeric(asteroids["estimated_diameter_min_km"], errors="coerce").fillna(0.0)
+    asteroids["estimated_diameter_max_km"] = pd.to_numeric(asteroids["estimated_diameter_max_km"], errors="coerce").fillna(0.0)
+    asteroids["is_potentially_hazardous_asteroid"] = asteroids["is_potentially_hazardous_asteroid"].fillna(False).astype(bool)
+
+    approaches = pd.json_normalize(neos, record_path="close_approach_data",
+                                   meta=["neo_reference_id"]).rename(columns={
+        "relative_velocity.kilometers_per_hour": "relative_velocity_kmph",
+        "miss_distance.astronomical": "astronomical",
+        "miss_distance.kilometers": "miss_distance_km",
+        "miss_distance.lunar": "miss_distance_lunar",
+    }).reindex(columns=APPROACH_COLUMNS)
+    dated = approaches["close_approach_date"].notna()
+    if not dated.all():
+        logger.debug(f"Skipped {int((~dated).sum())} approach records without a date")
+    approaches = approaches[dated]
+    approaches["neo_reference_id"] = approaches["neo_reference_id"].astype("int64")
+    for col in ["relative_velocity_kmph", "astronomical", "miss_distance_km", "miss_distance_lunar"]:
+        approaches[col] = pd.to_numeric(approaches[col], errors="coerce").fillna(0.0)
+    approaches["orbiting_body"] = approaches["orbiting_body"].fillna("Earth")
+    approaches["close_approach_date_epoch"] = (
+        pd.to_datetime(approaches["close_approach_date"], format="%Y-%m-%d")
+        - pd.Timestamp("1970-01-01")).dt.days
+
+    return asteroids, approaches
+
+async def _produce_batches(api_key, start_date, days_to_fetch, max_records, queue):
+    """Producer: fetch feed windows in waves and queue parsed batches
+
+    Puts (asteroids, approaches) DataFrame pairs on the queue in
+    chronological order; an Exception entry signals a failed window and None
+    marks the end of the stream.
+    """
+    current_date = datetime.strptime(start_date, "%Y-%m-%d")
+    periods_fetched = 0
+    record_count = 0
+
+    done = False
+    try:
+        while not done:
+
+            wave_size = FETCH_CONCURRENCY
+            if days_to_fetch:
+                wave_size = min(wave_size, days_to_fetch - periods_fetched)
+
+            windows = []
+            for _ in range(wave_size):
+                end_date = current_date + timedelta(days=6)
+                windows.append((current_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
+                current_date = end_date + timedelta(days=1)
+
+            payloads = await _gather_windows(api_key, windows)
+
+            for data in payloads:
+                if isinstance(data, Exception):
+                    await queue.put(data)
+                    done = True
+                    break
+
+                batch = _parse_feed_payload(data)
+                record_count += len(batch[0])
+                await queue.put(batch)
+
+                periods_fetched += 1
+                if (days_to_fetch and periods_fetched >= days_to_fetch) or record_count >= max_records:
+                    done = True
+                    break
+    except Exception as exc:
+        # a parse failure must reach the consumer like a fetch failure does,
+        # or it would block on queue.get() forever
+        await queue.put(exc)
+    finally:
+        await queue.put(None)
+
+async def _consume_batches(queue, days_to_fetch, max_records, progress_bar, status_text, progress_text):
+    """Consumer: insert each queued batch into SQLite as it arrives"""
+    asteroid_count = 0
+    approach_count = 0
+    periods_consumed = 0
+    seen_refs = set()
+    last_ui = 0.0
+
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            st.error(f"Error: {str(item)}")
+            break
+
+        asteroids, approaches = item
+        # the same asteroid shows up once per approach window; drop repeats
+        # here so they never cost a B-tree conflict check in SQLite
+        asteroids = asteroids[~asteroids["neo_reference_id"].isin(seen_refs)]
+        seen_refs.update(asteroids["neo_reference_id"].tolist())
+        remaining = max_records - asteroid_count
+        if len(asteroids) > remaining:
+            asteroids = asteroids.head(remaining)
+
+        a_count, c_count = insert_data_to_database(asteroids, approaches, bulk_mode=False)
+        asteroid_count += a_count
+        approach_count += c_count
+        periods_consumed += 1
+
+        # each widget update is a websocket frame; cap them at ~10 Hz so the
+        # UI never becomes the pipeline bottleneck on slow links
+        if time.monotonic() - last_ui > 0.1:
+            last_ui = time.monotonic()
+            status_text.text(f"{progress_text}: {asteroid_count} asteroids stored")
+            if days_to_fetch:
+                progress_bar.progress(min(1.0, periods_consumed / days_to_fetch))
+            else:
+                progress_bar.progress(min(1.0, asteroid_count / max_records))
+
+    status_text.text(f"{progress_text}: {asteroid_count} asteroids stored")
+    progress_bar.progress(1.0)
+
+    return asteroid_count, approach_count
+
+async def _run_collection(api_key, start_date, days_to_fetch, max_records,
+                          progress_bar, status_text, progress_text):
+    queue = asyncio.Queue(maxsize=4)
+    producer = asyncio.create_task(
+        _produce_batches(api_key, start_date, days_to_fetch, max_records, queue))
+    counts = await _consume_batches(queue, days_to_fetch, max_records,
+                                    progress_bar, status_text, progress_text)
+    producer.cancel()
+    return counts
+
+def fetch_and_store_neo_data(api_key, start_date, days_to_fetch=None, max_records=10000):
+    """
+    Fetch Near-Earth Object data from NASA API and stream it into SQLite
+
+    Window fetches and database writes overlap through a bounded queue, so
+    peak memory stays at a few windows' worth of rows rather than the whole
+    collection.
+
     Parameters:
     - api_key: Your NASA API key
     - start_date: Initial date to start fetching from (YYYY-MM-DD)
     - days_to_fetch: Number of 7-day periods to fetch (None = until max_records)
     - max_records: Maximum number of asteroid records to collect
-    
+
     Returns:
-    - asteroid_data: List of dicts with asteroid information
-    - approach_data: List of dicts with close approach information
+    - asteroid_count: Number of asteroid records stored
+    - approach_count: Number of close approach records stored
     """
-    asteroid_data = []
-    approach_data = []
-    record_count = 0
-    current_date = datetime.strptime(start_date, "%Y-%m-%d")
-    periods_fetched = 0
-    
     if not days_to_fetch:
         progress_text = f"Fetching NASA NEO data (target: {max_records} records)"
     else:
         progress_text = f"Fetching NASA NEO data for {days_to_fetch} periods"
-    
+
     progress_bar = st.progress(0)
     status_text = st.empty()
-    
-    while True:
 
-        end_date = current_date + timedelta(days=6)
-        
-        start_str = current_date.strftime("%Y-%m-%d")
-        end_str = end_date.strftime("%Y-%m-%d")
-        
-        status_text.text(f"{progress_text}: Processing {start_str} to {end_str}")
-        
-        url = f"https://api.nasa.gov/neo/rest/v1/feed?start_date={start_str}&end_date={end_str}&api_key={api_key}"
-        
-        try:
-            response = requests.get(url)
-            if response.status_code != 200:
-                st.error(f"Error fetching data: {response.status_code} - {response.text}")
-                break
-                
-            data = response.json()
-            
-            for date_str, daily_asteroids in data["near_earth_objects"].items():
-                for asteroid in daily_asteroids:
-                    if not all([
-                        asteroid.get("id"),
-                        asteroid.get("neo_reference_id"),
-                        asteroid.get("name"),
-                        asteroid.get("close_approach_data")
-                    ]):
-                        continue
-                    
-                    asteroid_info = {
-                        "id": int(asteroid.get("id")),
-                        "neo_reference_id": int(asteroid.get("neo_reference_id")),
-                        "name": asteroid.get("name"),
-                        "absolute_magnitude_h": float(asteroid.get("absolute_magnitude_h")) if asteroid.get("absolute_magnitude_h") else None,
-                        "estimated_diameter_min_km": float(asteroid.get("estimated_diameter", {}).get("kilometers", {}).get("estimated_diameter_min", 0)),
-                        "estimated_diameter_max_km": float(asteroid.get("estimated_diameter", {}).get("kilometers", {}).get("estimated_diameter_max", 0)),
-                        "is_potentially_hazardous_asteroid": asteroid.get("is_potentially_hazardous_asteroid", False)
-                    }
-                    
-                    for approach in asteroid.get("close_approach_data", []):
-                        if not approach.get("close_approach_date"):
-                            continue
-                        approach_info = {
-                            "neo_reference_id": int(asteroid.get("neo_reference_id")),
-                            "close_approach_date": approach.get("close_approach_date"),
-                            "relative_velocity_kmph": float(approach.get("relative_velocity", {}).get("kilometers_per_hour", 0)),
-                            "astronomical": float(approach.get("miss_distance", {}).get("astronomical", 0)),
-                            "miss_distance_km": float(approach.get("miss_distance", {}).get("kilometers", 0)),
-                            "miss_distance_lunar": float(approach.get("miss_distance", {}).get("lunar", 0)),
-                            "orbiting_body": approach.get("orbiting_body", "Earth")
-                        }
-                        approach_data.append(approach_info)
-                    
-                    asteroid_data.append(asteroid_info)
-                    record_count += 1
-            
-            if days_to_fetch:
-                progress_bar.progress(min(1.0, (periods_fetched + 1) / days_to_fetch))
-            else:
-                progress_bar.progress(min(1.0, record_count / max_records))
-            
-            periods_fetched += 1
-            if (days_to_fetch and periods_fetched >= days_to_fetch) or record_count >= max_records:
-                break
-            
-            current_date = end_date + timedelta(days=1)
-            
-            time.sleep(0.1)
-            
-        except Exception as e:
-            st.error(f"Error: {str(e)}")
-            break
-    
+    conn = get_conn()
+    for name in SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    try:
+        asteroid_count, approach_count = asyncio.run(
+            _run_collection(api_key, start_date, days_to_fetch, max_records,
+                            progress_bar, status_text, progress_text))
+    finally:
+        with conn:
+            for ddl in SECONDARY_INDEXES.values():
+                conn.execute(ddl)
+        conn.execute("ANALYZE")
+
     progress_bar.empty()
     status_text.empty()
-    
-    return asteroid_data[:max_records], approach_data
 
-def insert_data_to_database(asteroid_data, approach_data):
-    """Insert the fetched data into SQLite database"""
-    conn = sqlite3.connect('nasa_neo_data.db')
-    cursor = conn.cursor()
-    
-    for asteroid in asteroid_data:
-        cursor.execute('''
-        INSERT OR IGNORE INTO asteroids (id, neo_reference_id, name, absolute_magnitude_h, 
-                                        estimated_diameter_min_km, estimated_diameter_max_km, 
-                                        is_potentially_hazardous_asteroid)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            asteroid["id"],
-            asteroid["neo_reference_id"],
-            asteroid["name"],
-            asteroid["absolute_magnitude_h"],
-            asteroid["estimated_diameter_min_km"],
-            asteroid["estimated_diameter_max_km"],
-            asteroid["is_potentially_hazardous_asteroid"]
-        ))
-    
-    for approach in approach_data:
-        cursor.execute('''
-        INSERT INTO close_approach (neo_reference_id, close_approach_date, relative_velocity_kmph,
-                                  astronomical, miss_distance_km, miss_distance_lunar, orbiting_body)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            approach["neo_reference_id"],
-            approach["close_approach_date"],
-            approach["relative_velocity_kmph"],
-            approach["astronomical"],
-            approach["miss_distance_km"],
-            approach["miss_distance_lunar"],
-            approach["orbiting_body"]
-        ))
-    
-    conn.commit()
-    conn.close()
-    
+    return asteroid_count, approach_count
+
+def _insert_or_ignore(table, conn, keys, data_iter):
+    """to_sql insert method: multi-row INSERT OR IGNORE, so rows already in
+    the table fall out quietly instead of raising on the unique index"""
+    rows = list(data_iter)
+    if not rows:
+        return 0
+    columns = ", ".join(keys)
+    placeholders = ", ".join(["(" + ", ".join(["?"] * len(keys)) + ")"] * len(rows))
+    params = [value for row in rows for value in row]
+    conn.execute(f"INSERT OR IGNORE INTO {table.name} ({columns}) VALUES {placeholders}", params)
+    return len(rows)
+
+def insert_data_to_database(asteroid_data, approach_data, bulk_mode=True):
+    """Insert the fetched asteroid and approach DataFrames into SQLite
+
+    With bulk_mode, the close_approach secondary indexes are dropped for the
+    duration of the insert and rebuilt afterwards, which is much cheaper than
+    updating them per row on a large ingest.
+    """
+    conn = get_conn()
+
+    asteroid_data = asteroid_data.drop_duplicates("neo_reference_id")
+
+    if bulk_mode:
+        for name in SECONDARY_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    with conn:
+        asteroid_data.to_sql("asteroids", conn, if_exists="append", index=False,
+                             method=_insert_or_ignore, chunksize=500)
+        approach_data.to_sql("close_approach", conn, if_exists="append", index=False,
+                             method="multi", chunksize=500)
+
+    if bulk_mode:
+        with conn:
+            for ddl in SECONDARY_INDEXES.values():
+                conn.execute(ddl)
+
+    # WAL commits land in the -wal file without touching the main db's
+    # mtime, so the mtime-keyed caches must be cleared explicitly
+    execute_query.clear()
+    filter_data.clear()
+    _load_filter_ranges.clear()
+
     return len(asteroid_data), len(approach_data)
 
 def delete_all_records():
     """Delete all records from asteroids and close_approach tables"""
     logger.debug("Attempting to delete all records from database")
     try:
-        conn = sqlite3.connect('nasa_neo_data.db')
+        conn = get_conn()
         cursor = conn.cursor()
         
         cursor.execute("DELETE FROM close_approach")
@@ -229,25 +424,26 @@ def delete_all_records():
         
         conn.commit()
         logger.debug("Successfully deleted all records")
-        conn.close()
+        execute_query.clear()
+        filter_data.clear()
+        _load_filter_ranges.clear()
         return True
     except Exception as e:
         logger.error(f"Failed to delete records: {str(e)}")
-        conn.close()
         raise Exception(f"Failed to delete records: {str(e)}")
 
 def database_has_data():
     """Check if the database already has asteroid data"""
     try:
-        conn = sqlite3.connect('nasa_neo_data.db')
+        conn = get_conn()
         cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM asteroids")
         count = cursor.fetchone()[0]
-        conn.close()
         return count > 0
     except:
         return False
 
+@st.cache_resource
 def get_predefined_queries():
     return {
         "1. Count approaches per asteroid": """
@@ -304,15 +500,16 @@ def get_predefined_queries():
             LIMIT 20
         """,
         "8. Asteroids getting closer over time": """
+            WITH multi AS (
+                SELECT neo_reference_id
+                FROM close_approach
+                GROUP BY neo_reference_id
+                HAVING COUNT(*) > 1
+            )
             SELECT a.name, c.close_approach_date, c.miss_distance_km
             FROM asteroids a
             JOIN close_approach c ON a.neo_reference_id = c.neo_reference_id
-            WHERE a.id IN (
-                SELECT neo_reference_id 
-                FROM close_approach 
-                GROUP BY neo_reference_id 
-                HAVING COUNT(*) > 1
-            )
+            JOIN multi m ON m.neo_reference_id = a.neo_reference_id
             ORDER BY a.id, c.close_approach_date
             LIMIT 50
         """,
@@ -411,81 +608,126 @@ def get_predefined_queries():
         """
     }
 
-def execute_query(query):
-    """Execute a SQL query and return results as a DataFrame"""
-    conn = sqlite3.connect('nasa_neo_data.db')
+def _db_mtime():
+    """Modification time of the database file, used as a cache key"""
+    try:
+        return os.stat('nasa_neo_data.db').st_mtime
+    except OSError:
+        return 0.0
+
+@st.cache_data(ttl=3600, max_entries=64)
+def execute_query(query, db_mtime):
+    """Execute a SQL query and return results as a DataFrame
+
+    db_mtime keys the Streamlit cache, so cached results are reused across
+    reruns and refreshed whenever the database file changes.
+    """
+    conn = get_conn()
     try:
         results = pd.read_sql_query(query, conn)
-        conn.close()
         return results
     except Exception as e:
-        conn.close()
         st.error(f"Query execution failed: {str(e)}")
         return pd.DataFrame()
 
+# Bar/line/scatter render client-side as Vega-Lite charts from a small Arrow
+# payload, skipping server-side Agg rasterization. Histogram and box plots
+# have no Vega equivalent and stay on matplotlib.
+def _plot_bar(df, query_name):
+    st.bar_chart(df.head(20).set_index(df.columns[0])[df.columns[1]])
+
+def _plot_line(df, query_name):
+    st.line_chart(df.set_index(df.columns[0])[df.columns[1]])
+
+def _plot_scatter(df, query_name):
+    st.scatter_chart(df, x=df.columns[1], y=df.columns[2])
+
+def _plot_hist(df, query_name):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.histplot(data=df, x=df.columns[1], bins=30, ax=ax)
+    plt.xlabel('Velocity (km/h)')
+    plt.ylabel('Count')
+    plt.title(query_name)
+    plt.tight_layout()
+    st.pyplot(fig)
+
+def _plot_box(df, query_name):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.boxplot(data=df, y=df.columns[1], ax=ax)
+    plt.ylabel('Diameter (km)')
+    plt.title(query_name)
+    plt.tight_layout()
+    st.pyplot(fig)
+
+# Direct query-name -> plot dispatch; queries without an entry render no chart
+VIS_DISPATCH = {
+    "1. Count approaches per asteroid": _plot_bar,
+    "2. Average velocity per asteroid": _plot_hist,
+    "5. Month with most asteroid approaches": _plot_bar,
+    "7. Asteroids by max diameter (desc)": _plot_box,
+    "11. Approach count by month": _plot_line,
+    "13. Hazardous vs non-hazardous count": _plot_bar,
+    "20. Size-velocity correlation": _plot_scatter,
+}
+
+def _to_csv_bytes(df):
+    """Encode a DataFrame as UTF-8 CSV bytes
+
+    Rows stream through a text wrapper straight into the bytes buffer in
+    chunks, so only one encoded copy is ever materialized.
+    """
+    buf = io.BytesIO()
+    wrapper = io.TextIOWrapper(buf, encoding="utf-8", newline="")
+    df.to_csv(wrapper, index=False, chunksize=50000)
+    wrapper.flush()
+    wrapper.detach()
+    return buf.getvalue()
+
 def visualize_results(df, query_name):
     """Create appropriate visualizations based on the query results"""
     if df.empty:
         st.warning("No data available for visualization")
         return
-    
+
+    plot_func = VIS_DISPATCH.get(query_name)
+    if plot_func is None:
+        return
+
     try:
-        if "count" in query_name.lower() or "vs" in query_name.lower():
-            fig, ax = plt.subplots(figsize=(10, max(6, min(df.shape[0] * 0.3, 15))))
-            sns.barplot(data=df.head(20), y=df.columns[0], x=df.columns[1], ax=ax)
-            plt.xlabel(df.columns[1])
-            plt.ylabel(df.columns[0])
-            plt.title(query_name)
-            plt.tight_layout()
-            st.pyplot(fig)
-        
-        elif "month" in query_name.lower() and "by month" in query_name.lower():
-            fig, ax = plt.subplots(figsize=(12, 6))
-            sns.lineplot(data=df, x=df.columns[0], y=df.columns[1], marker='o', ax=ax)
-            plt.xlabel('Month')
-            plt.ylabel('Count')
-            plt.title(query_name)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            st.pyplot(fig)
-        
-        elif ("diameter" in query_name.lower() or "size" in query_name.lower()) and "correlation" in query_name.lower():
-            fig, ax = plt.subplots(figsize=(10, 6))
-            sns.scatterplot(data=df, x=df.columns[1], y=df.columns[2], ax=ax)
-            plt.xlabel('Diameter (km)')
-            plt.ylabel('Average Velocity (km/h)')
-            plt.title(query_name)
-            plt.tight_layout()
-            st.pyplot(fig)
-        
-        elif "velocity" in query_name.lower() and "fastest" not in query_name.lower():
-            fig, ax = plt.subplots(figsize=(10, 6))
-            sns.histplot(data=df, x=df.columns[1], bins=30, ax=ax)
-            plt.xlabel('Velocity (km/h)')
-            plt.ylabel('Count')
-            plt.title(query_name)
-            plt.tight_layout()
-            st.pyplot(fig)
-        
-        elif "diameter" in query_name.lower():
-            fig, ax = plt.subplots(figsize=(10, 6))
-            sns.boxplot(data=df, y=df.columns[1], ax=ax)
-            plt.ylabel('Diameter (km)')
-            plt.title(query_name)
-            plt.tight_layout()
-            st.pyplot(fig)
+        plot_func(df, query_name)
     except Exception as e:
         st.warning(f"Could not generate visualization: {str(e)}")
 
-def filter_data(date_range, au_range, lunar_range, velocity_range, diameter_range, hazardous):
-    """Apply filters to asteroid data and return filtered results"""
-    conn = sqlite3.connect('nasa_neo_data.db')
+# color lookup indexed by the hazardous flag: [non-hazardous, hazardous]
+HAZARD_PALETTE = np.array(["#1f77b4", "#d62728"])
+
+def _epoch_days(d):
+    """Days since the Unix epoch for a date object"""
+    return (d - date(1970, 1, 1)).days
+
+@st.cache_data(ttl=3600, max_entries=32)
+def filter_data(date_range, au_range, lunar_range, velocity_range, diameter_range, hazardous, db_mtime):
+    """Apply filters to asteroid data and return filtered results
+
+    All arguments are hashable, so reruns with unchanged filter settings are
+    served from the Streamlit cache; db_mtime invalidates on new data.
+    """
+    conn = get_conn()
     
+    # Expected plan (verify with EXPLAIN QUERY PLAN if this query changes):
+    # close_approach driven by idx_ca_epoch_au (or idx_ca_date_epoch) when a
+    # date range is set, joined to asteroids via the unique neo_reference_id
+    # index. Predicates are dynamic, so no INDEXED BY hint is forced here;
+    # the ANALYZE after each ingest keeps the planner's stats honest.
     query = """
-    SELECT a.id, a.neo_reference_id, a.name, a.absolute_magnitude_h, 
-           a.estimated_diameter_min_km, a.estimated_diameter_max_km, 
-           a.is_potentially_hazardous_asteroid, c.close_approach_date, 
-           c.relative_velocity_kmph, c.astronomical, c.miss_distance_km, 
+    SELECT a.id, a.neo_reference_id, a.name, a.absolute_magnitude_h,
+           a.estimated_diameter_min_km, a.estimated_diameter_max_km,
+           a.is_potentially_hazardous_asteroid, c.close_approach_date,
+           c.relative_velocity_kmph, c.astronomical, c.miss_distance_km,
            c.miss_distance_lunar, c.orbiting_body
     FROM asteroids a
     JOIN close_approach c ON a.neo_reference_id = c.neo_reference_id
@@ -496,8 +738,8 @@ def filter_data(date_range, au_range, lunar_range, velocity_range, diameter_rang
 
     if date_range and len(date_range) == 2:
         start_date, end_date = date_range
-        query += " AND c.close_approach_date BETWEEN ? AND ?"
-        params.extend([start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")])
+        query += " AND c.close_approach_date_epoch BETWEEN ? AND ?"
+        params.extend([_epoch_days(start_date), _epoch_days(end_date)])
     if au_range:
         min_au, max_au = au_range
         query += " AND c.astronomical BETWEEN ? AND ?"
@@ -525,14 +767,38 @@ def filter_data(date_range, au_range, lunar_range, velocity_range, diameter_rang
     query += " LIMIT 1000"
     
     try:
-        results = pd.read_sql_query(query, conn, params=params)
-        conn.close()
+        # Arrow-backed dtypes halve the frame's memory footprint and keep
+        # the numeric columns contiguous for the plotting paths
+        results = pd.read_sql_query(query, conn, params=params, dtype_backend="pyarrow")
+        results["is_potentially_hazardous_asteroid"] = \
+            results["is_potentially_hazardous_asteroid"].astype("bool[pyarrow]")
         return results
     except Exception as e:
-        conn.close()
         st.error(f"Filter query failed: {str(e)}")
         return pd.DataFrame()
     
+@st.cache_data(ttl=3600)
+def _load_filter_ranges(db_mtime):
+    """Min/max bounds for the filter widgets, cached per database version
+
+    Each scalar subselect is an O(1) index endpoint lookup rather than a
+    scan of the join.
+    """
+    conn = get_conn()
+    return pd.read_sql_query("""
+        SELECT
+            (SELECT MIN(close_approach_date) FROM close_approach) as min_date,
+            (SELECT MAX(close_approach_date) FROM close_approach) as max_date,
+            (SELECT MIN(astronomical) FROM close_approach) as min_au,
+            (SELECT MAX(astronomical) FROM close_approach) as max_au,
+            (SELECT MIN(miss_distance_lunar) FROM close_approach) as min_lunar,
+            (SELECT MAX(miss_distance_lunar) FROM close_approach) as max_lunar,
+            (SELECT MIN(relative_velocity_kmph) FROM close_approach) as min_velocity,
+            (SELECT MAX(relative_velocity_kmph) FROM close_approach) as max_velocity,
+            (SELECT MIN(estimated_diameter_max_km) FROM asteroids) as min_diameter,
+            (SELECT MAX(estimated_diameter_max_km) FROM asteroids) as max_diameter
+    """, conn)
+
 def main():
     st.title("🚀 NASA Near-Earth Object (NEO) Tracker")
     st.markdown("Explore data about asteroids that have passed near Earth.")
@@ -581,35 +847,33 @@ def main():
                 st.error("Please enter your NASA API key")
             else:
                 start_time = time.time()
-                asteroid_data, approach_data = fetch_nasa_neo_data(
-                    api_key=api_key,
-                    start_date=start_date.strftime("%Y-%m-%d"),
-                    days_to_fetch=num_periods,
-                    max_records=max_records or 10000
-                )
-                
-                if asteroid_data:
-                    try:
-                        a_count, c_count = insert_data_to_database(asteroid_data, approach_data)
-                        end_time = time.time()
-                        
-                        st.success(f"✅ Successfully collected {a_count} asteroid records with {c_count} approach events " +
-                                   f"in {end_time - start_time:.2f} seconds")
-                        
-                        if a_count > 0:
-                            st.subheader("Sample of collected asteroid data")
-                            conn = sqlite3.connect('nasa_neo_data.db')
-                            sample_data = pd.read_sql_query(
-                                "SELECT a.id, a.neo_reference_id, a.name, a.is_potentially_hazardous_asteroid, " +
-                                "c.close_approach_date, c.miss_distance_km, c.relative_velocity_kmph, c.astronomical, " +
-                                "c.miss_distance_lunar, c.orbiting_body " +
-                                "FROM asteroids a JOIN close_approach c ON a.neo_reference_id = c.neo_reference_id LIMIT 10", 
-                                conn
-                            )
-                            conn.close()
-                            st.dataframe(sample_data)
-                    except Exception as e:
-                        st.error(f"Failed to insert data: {str(e)}")
+                try:
+                    a_count, c_count = fetch_and_store_neo_data(
+                        api_key=api_key,
+                        start_date=start_date.strftime("%Y-%m-%d"),
+                        days_to_fetch=num_periods,
+                        max_records=max_records or 10000
+                    )
+                except Exception as e:
+                    st.error(f"Failed to insert data: {str(e)}")
+                    a_count, c_count = 0, 0
+
+                if a_count > 0:
+                    end_time = time.time()
+
+                    st.success(f"✅ Successfully collected {a_count} asteroid records with {c_count} approach events " +
+                               f"in {end_time - start_time:.2f} seconds")
+
+                    st.subheader("Sample of collected asteroid data")
+                    conn = get_conn()
+                    sample_data = pd.read_sql_query(
+                        "SELECT a.id, a.neo_reference_id, a.name, a.is_potentially_hazardous_asteroid, " +
+                        "c.close_approach_date, c.miss_distance_km, c.relative_velocity_kmph, c.astronomical, " +
+                        "c.miss_distance_lunar, c.orbiting_body " +
+                        "FROM asteroids a JOIN close_approach c ON a.neo_reference_id = c.neo_reference_id LIMIT 10",
+                        conn
+                    )
+                    st.dataframe(sample_data)
                 else:
                     st.error("Failed to collect data. Please check your API key and try again.")
         st.subheader("Clear Database")
@@ -669,7 +933,7 @@ def main():
         
         if st.button("Run Query"):
             with st.spinner("Executing query..."):
-                results = execute_query(queries[selected_query])
+                results = execute_query(queries[selected_query], _db_mtime())
                 
                 if not results.empty:
                     st.subheader("Query Results")
@@ -678,7 +942,7 @@ def main():
                     st.subheader("Visualization")
                     visualize_results(results, selected_query)
                     
-                    csv = results.to_csv(index=False).encode('utf-8')
+                    csv = _to_csv_bytes(results)
                     st.download_button(
                         "Download results as CSV",
                         csv,
@@ -696,28 +960,12 @@ def main():
             st.warning("No asteroid data found in database. Please collect data first.")
             return
         
-        conn = sqlite3.connect('nasa_neo_data.db')
-        min_max_df = pd.read_sql_query("""
-            SELECT 
-                MIN(c.close_approach_date) as min_date,
-                MAX(c.close_approach_date) as max_date,
-                MIN(c.astronomical) as min_au,
-                MAX(c.astronomical) as max_au,
-                MIN(c.miss_distance_lunar) as min_lunar,
-                MAX(c.miss_distance_lunar) as max_lunar,
-                MIN(c.relative_velocity_kmph) as min_velocity,
-                MAX(c.relative_velocity_kmph) as max_velocity,
-                MIN(a.estimated_diameter_max_km) as min_diameter,
-                MAX(a.estimated_diameter_max_km) as max_diameter
-            FROM close_approach c
-            JOIN asteroids a ON c.neo_reference_id = a.neo_reference_id
-        """, conn)
-        conn.close()
+        min_max_df = _load_filter_ranges(_db_mtime())
         
         if not min_max_df.empty:
 
-            min_date = datetime.strptime(min_max_df['min_date'].iloc[0], "%Y-%m-%d")
-            max_date = datetime.strptime(min_max_df['max_date'].iloc[0], "%Y-%m-%d")
+            min_date = date.fromisoformat(min_max_df['min_date'].iloc[0])
+            max_date = date.fromisoformat(min_max_df['max_date'].iloc[0])
             min_au = float(min_max_df['min_au'].iloc[0])
             max_au = min(float(min_max_df['max_au'].iloc[0]), 1.0)  
             min_lunar = float(min_max_df['min_lunar'].iloc[0])
@@ -788,7 +1036,8 @@ def main():
                         lunar_range=lunar_range,
                         velocity_range=velocity_range,
                         diameter_range=diameter_range,
-                        hazardous=hazardous
+                        hazardous=hazardous,
+                        db_mtime=_db_mtime()
                     )
                     
                     if not filtered_results.empty:
@@ -796,37 +1045,45 @@ def main():
                         st.dataframe(filtered_results)
                         
                         st.subheader("Visualizations")
+
+                        # matplotlib is only loaded once a chart actually
+                        # renders, keeping it off the cold-start path
+                        import matplotlib.pyplot as plt
                         
+                        # extract typed column arrays once and scatter them
+                        # directly, instead of seaborn re-indexing the frame
+                        # per aesthetic
+                        x = filtered_results["estimated_diameter_max_km"].to_numpy(dtype=np.float32)
+                        y = filtered_results["relative_velocity_kmph"].to_numpy(dtype=np.float32)
+                        sizes = np.clip(filtered_results["miss_distance_lunar"].to_numpy(dtype=np.float32) * 2, 5, 200)
+                        haz_mask = filtered_results["is_potentially_hazardous_asteroid"].to_numpy(dtype=bool)
+                        colors = HAZARD_PALETTE[haz_mask.astype(np.uint8)]
                         fig, ax = plt.subplots(figsize=(10, 6))
-                        sns.scatterplot(
-                            data=filtered_results,
-                            x="estimated_diameter_max_km",
-                            y="relative_velocity_kmph",
-                            hue="is_potentially_hazardous_asteroid",
-                            size="miss_distance_lunar",
-                            ax=ax
-                        )
+                        ax.scatter(x, y, s=sizes, c=colors, alpha=0.6)
                         plt.xlabel("Max Diameter (km)")
                         plt.ylabel("Velocity (km/h)")
                         plt.title("Asteroid Size vs Velocity")
                         plt.tight_layout()
                         st.pyplot(fig)
                         
+                        # precomputed per-class histograms keep plotting
+                        # memory at O(bins) no matter how many rows matched
+                        vals = filtered_results["miss_distance_km"].to_numpy(dtype=np.float64)
+                        haz = filtered_results["is_potentially_hazardous_asteroid"].to_numpy(dtype=bool)
+                        edges = np.linspace(vals.min(), vals.max(), 31)
                         fig, ax = plt.subplots(figsize=(10, 6))
-                        sns.histplot(
-                            data=filtered_results,
-                            x="miss_distance_km",
-                            hue="is_potentially_hazardous_asteroid",
-                            bins=30,
-                            ax=ax
-                        )
+                        ax.stairs(np.histogram(vals[~haz], bins=edges)[0], edges,
+                                  fill=True, alpha=0.6, label="Non-Hazardous")
+                        ax.stairs(np.histogram(vals[haz], bins=edges)[0], edges,
+                                  fill=True, alpha=0.6, label="Hazardous")
+                        ax.legend()
                         plt.xlabel("Miss Distance (km)")
                         plt.ylabel("Count")
                         plt.title("Distribution of Miss Distances")
                         plt.tight_layout()
                         st.pyplot(fig)
                         
-                        csv = filtered_results.to_csv(index=False).encode('utf-8')
+                        csv = _to_csv_bytes(filtered_results)
                         st.download_button(
                             "Download filtered results as CSV",
                             csv,